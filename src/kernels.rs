@@ -0,0 +1,201 @@
+//! Scalar containment kernels used by the region classes.
+//!
+//! These take raw coordinates in degrees so that the per-point work is plain float math,
+//! with no python objects or allocation involved.
+
+/// Wraps a difference in RA (degrees) onto [-180, 180].
+///
+/// Doing this in degrees keeps points either side of the 0/360 line symmetric, e.g.
+/// 358 - 0 and 0 - 2 both map to a magnitude of exactly 2 degrees.
+#[inline]
+pub fn wrap_delta_ra(delta_ra: f64) -> f64 {
+    if delta_ra > 180.0 {
+        delta_ra - 360.0
+    } else if delta_ra < -180.0 {
+        delta_ra + 360.0
+    } else {
+        delta_ra
+    }
+}
+
+/// Slack on the threshold of a zero radius. A point at the center computes a cosine that can
+/// round up to a couple of ulps below 1, which would otherwise miss the exact match.
+const ZERO_RADIUS_SLACK: f64 = 4.0 * f64::EPSILON;
+
+/// Cosine threshold for an angular radius given in degrees.
+///
+/// Separation is monotonic in its cosine on [0, 180], so comparing cosines is equivalent to
+/// comparing angles. Outside that range cos would fold back on itself, so negative radii map
+/// to a threshold nothing reaches and radii of 180 or more to one everything passes (an exact
+/// antipode can round to just below -1).
+#[inline]
+pub fn cos_radius(radius_deg: f64) -> f64 {
+    if radius_deg < 0.0 {
+        f64::INFINITY
+    } else if radius_deg >= 180.0 {
+        f64::NEG_INFINITY
+    } else if radius_deg == 0.0 {
+        1.0 - ZERO_RADIUS_SLACK
+    } else {
+        radius_deg.to_radians().cos()
+    }
+}
+
+/// Cosine threshold for the inner edge of an anulus.
+///
+/// An inner radius of zero or less leaves no hole, so the center itself stays inside.
+#[inline]
+pub fn cos_inner_radius(radius_deg: f64) -> f64 {
+    if radius_deg <= 0.0 {
+        f64::INFINITY
+    } else {
+        cos_radius(radius_deg)
+    }
+}
+
+/// A fixed point on the sky with its trigonometry worked out once.
+///
+/// Regions are built once and queried many times, so anything that only depends on the
+/// center is computed here rather than on every call.
+#[derive(Clone, Copy, Debug)]
+pub struct SkyCenter {
+    ra: f64,
+    sin_dec: f64,
+    cos_dec: f64,
+}
+
+impl SkyCenter {
+    pub fn new(ra: f64, dec: f64) -> Self {
+        let (sin_dec, cos_dec) = dec.to_radians().sin_cos();
+        SkyCenter {
+            ra,
+            sin_dec,
+            cos_dec,
+        }
+    }
+
+    /// Cosine of the great circle separation to the given point (spherical law of cosines).
+    ///
+    /// Callers compare this against the cosine of their radius instead of recovering the
+    /// angle, which saves the inverse trig call on every point. Rounding can push the sum just
+    /// past +-1, so it is clamped back onto the range a cosine can take.
+    #[inline]
+    pub fn cos_separation(&self, ra: f64, dec: f64) -> f64 {
+        let delta_ra = wrap_delta_ra(ra - self.ra).to_radians();
+        let (sin_dec, cos_dec) = dec.to_radians().sin_cos();
+        (self.sin_dec * sin_dec + self.cos_dec * cos_dec * delta_ra.cos()).clamp(-1.0, 1.0)
+    }
+
+    /// Cartesian (x, y, z) position of the center on the unit sphere.
+    pub fn unit_vector(&self) -> [f64; 3] {
+        let (sin_ra, cos_ra) = self.ra.to_radians().sin_cos();
+        [self.cos_dec * cos_ra, self.cos_dec * sin_ra, self.sin_dec]
+    }
+}
+
+/// True if the point lies within the radius whose cosine is `cos_radius` (boundary inclusive).
+#[inline]
+pub fn aperture_contains(center: &SkyCenter, cos_radius: f64, ra: f64, dec: f64) -> bool {
+    center.cos_separation(ra, dec) >= cos_radius
+}
+
+/// True if the point lies between the inner and outer radii (both inclusive).
+///
+/// The radii are passed as cosines, so the inner radius has the larger value. The outer edge
+/// is checked first.
+#[inline]
+pub fn anulus_contains(
+    center: &SkyCenter,
+    cos_inner: f64,
+    cos_outer: f64,
+    ra: f64,
+    dec: f64,
+) -> bool {
+    let cos_separation = center.cos_separation(ra, dec);
+    (cos_separation >= cos_outer) & (cos_separation <= cos_inner)
+}
+
+/// Slack added to bounding caps so rounding never rejects a point on the polygon edge.
+const CAP_MARGIN: f64 = 1e-9;
+
+/// Slack added to chord searches so rounding in the unit vectors never drops a point on the
+/// edge of a cap. Candidates always go through the exact test afterwards.
+const CHORD_MARGIN: f64 = 1e-9;
+
+/// A cheap conservative cap around a region, used to reject far away points before the
+/// exact containment test.
+#[derive(Clone, Copy, Debug)]
+pub struct BoundingCap {
+    center: SkyCenter,
+    cos_radius: f64,
+}
+
+impl BoundingCap {
+    pub fn new(center: SkyCenter, cos_radius: f64) -> Self {
+        BoundingCap { center, cos_radius }
+    }
+
+    /// Builds a cap enclosing the RA/Dec box of the vertices, or `None` if no useful cap exists.
+    ///
+    /// RAs are unwrapped relative to the first vertex so that polygons over the 0/360 line get
+    /// a tight box. The cap is centered on the box and reaches its furthest corner, which
+    /// encloses the whole box. Caps smaller than a hemisphere are convex, so they also
+    /// enclose the great circle edges between the vertices. Wide polygons and polygons
+    /// around a pole get no cap and always go to the exact test.
+    pub fn around(ra_vertices: &[f64], dec_vertices: &[f64]) -> Option<Self> {
+        let first_ra = *ra_vertices.first()?;
+        let mut ra_min = f64::INFINITY;
+        let mut ra_max = f64::NEG_INFINITY;
+        let mut dec_min = f64::INFINITY;
+        let mut dec_max = f64::NEG_INFINITY;
+        for (&ra, &dec) in ra_vertices.iter().zip(dec_vertices.iter()) {
+            let ra = first_ra + wrap_delta_ra(ra - first_ra);
+            ra_min = ra_min.min(ra);
+            ra_max = ra_max.max(ra);
+            dec_min = dec_min.min(dec);
+            dec_max = dec_max.max(dec);
+        }
+        if ra_max - ra_min >= 180.0 {
+            return None;
+        }
+
+        let center = SkyCenter::new(
+            ((ra_min + ra_max) / 2.0).rem_euclid(360.0),
+            (dec_min + dec_max) / 2.0,
+        );
+        let cos_radius = [
+            (ra_min, dec_min),
+            (ra_min, dec_max),
+            (ra_max, dec_min),
+            (ra_max, dec_max),
+        ]
+        .iter()
+        .map(|&(ra, dec)| center.cos_separation(ra, dec))
+        .fold(f64::INFINITY, f64::min);
+        if cos_radius <= 0.0 {
+            return None;
+        }
+        Some(BoundingCap {
+            center,
+            cos_radius: cos_radius - CAP_MARGIN,
+        })
+    }
+
+    /// False only if the point is certainly outside the region.
+    #[inline]
+    pub fn may_contain(&self, ra: f64, dec: f64) -> bool {
+        aperture_contains(&self.center, self.cos_radius, ra, dec)
+    }
+
+    pub fn center(&self) -> &SkyCenter {
+        &self.center
+    }
+
+    /// Squared straight-line (chord) length of the cap radius, for unit vector searches.
+    ///
+    /// Clamped to the chords that exist on the unit sphere, so the infinite thresholds from
+    /// [`cos_radius`] give an empty or whole-sky search, then padded by a small margin.
+    pub fn chord_squared(&self) -> f64 {
+        (2.0 - 2.0 * self.cos_radius).clamp(0.0, 4.0) + CHORD_MARGIN
+    }
+}
@@ -1,145 +1,444 @@
 use astroxide::{
-    regions::{SphericalAnulus, SphericalAperture, SphericalPolygon, SphericalShape},
+    regions::{SphericalPolygon, SphericalShape},
     spherical_trig::build_kd_tree,
 };
+use kiddo::{ImmutableKdTree, SquaredEuclidean};
+use numpy::{AllowTypeChange, IntoPyArray, PyArray1, PyArrayLike1, PyArrayLike2, PyReadonlyArray1};
+use pyo3::exceptions::{PyTypeError, PyValueError};
 use pyo3::prelude::*;
+use rayon::prelude::*;
+use std::borrow::Cow;
 
-#[pyclass]
+mod kernels;
+
+use kernels::{BoundingCap, SkyCenter};
+
+/// Smallest number of points given to a single rayon task, so short batches stay on one thread.
+const MIN_POINTS_PER_TASK: usize = 4096;
+
+/// kd-tree over positions on the sky stored as unit vectors.
+type UnitVectorTree = ImmutableKdTree<f64, u64, 3, 32>;
+
+/// Builds a kd-tree over the catalogue positions, or `None` for an empty catalogue.
+fn unit_vector_tree(ras: &[f64], decs: &[f64]) -> Option<UnitVectorTree> {
+    let positions: Vec<[f64; 3]> = ras
+        .iter()
+        .zip(decs.iter())
+        .map(|(&ra, &dec)| SkyCenter::new(ra, dec).unit_vector())
+        .collect();
+    (!positions.is_empty()).then(|| ImmutableKdTree::new_from_slice(&positions))
+}
+
+/// Sets `result` for every catalogue point inside a region.
+///
+/// The tree only supplies the candidates within the region's bounding cap. The region's own
+/// `is_inside` decides each one, so this always agrees with `check_points`.
+fn mark_inside(
+    tree: &UnitVectorTree,
+    ras: &[f64],
+    decs: &[f64],
+    cap: &BoundingCap,
+    is_inside: impl Fn(f64, f64) -> bool,
+    result: &mut [bool],
+) {
+    let candidates =
+        tree.within_unsorted::<SquaredEuclidean>(&cap.center().unit_vector(), cap.chord_squared());
+    for candidate in candidates {
+        let i = candidate.item as usize;
+        result[i] |= is_inside(ras[i], decs[i]);
+    }
+}
+
+/// Borrows the array data when it is already contiguous, copying only strided views.
+fn contiguous<'a>(array: &'a PyReadonlyArray1<'_, f64>) -> Cow<'a, [f64]> {
+    match array.as_slice() {
+        Ok(slice) => Cow::Borrowed(slice),
+        Err(_) => Cow::Owned(array.as_array().iter().copied().collect()),
+    }
+}
+
+/// Pulls the ra/dec columns out of the python arguments as contiguous f64 slices.
+fn coordinate_columns<'a>(
+    ras: &'a PyReadonlyArray1<'_, f64>,
+    decs: &'a PyReadonlyArray1<'_, f64>,
+) -> PyResult<(Cow<'a, [f64]>, Cow<'a, [f64]>)> {
+    let ras = contiguous(ras);
+    let decs = contiguous(decs);
+    if ras.len() != decs.len() {
+        return Err(PyValueError::new_err(format!(
+            "ra and dec must be the same length ({} != {})",
+            ras.len(),
+            decs.len()
+        )));
+    }
+    Ok((ras, decs))
+}
+
+#[pyclass(frozen)]
 pub struct Polygon {
     polygon: SphericalPolygon,
+    bounds: Option<BoundingCap>,
 }
 
 #[pymethods]
 impl Polygon {
     #[new]
-    pub fn new(ra_verticies: Vec<f64>, dec_verticies: Vec<f64>) -> Self {
-        let polygon = SphericalPolygon::new(ra_verticies, dec_verticies);
-        Polygon { polygon }
+    pub fn new(
+        ra_verticies: PyArrayLike1<'_, f64, AllowTypeChange>,
+        dec_verticies: PyArrayLike1<'_, f64, AllowTypeChange>,
+    ) -> PyResult<Self> {
+        let (ras, decs) = coordinate_columns(&ra_verticies, &dec_verticies)?;
+        Ok(Polygon::from_columns(ras.into_owned(), decs.into_owned()))
+    }
+
+    /// Builds a polygon from a single (N, 2) array of (ra, dec) vertex pairs.
+    #[staticmethod]
+    pub fn from_vertices(vertices: PyArrayLike2<'_, f64, AllowTypeChange>) -> PyResult<Self> {
+        let vertices = vertices.as_array();
+        if vertices.ncols() != 2 {
+            return Err(PyValueError::new_err(format!(
+                "vertices must have shape (N, 2), got {:?}",
+                vertices.shape()
+            )));
+        }
+        let ras = vertices.column(0).iter().copied().collect();
+        let decs = vertices.column(1).iter().copied().collect();
+        Ok(Polygon::from_columns(ras, decs))
     }
 
     pub fn is_inside(&self, ra_point: f64, dec_point: f64) -> bool {
-        self.polygon.is_inside(ra_point, dec_point)
+        self.may_contain(ra_point, dec_point) && self.polygon.is_inside(ra_point, dec_point)
     }
 
-    pub fn check_points(&self, ra_points: Vec<f64>, dec_points: Vec<f64>) -> Vec<bool> {
-        self.polygon.are_inside(&ra_points, &dec_points)
+    pub fn check_points<'py>(
+        &self,
+        py: Python<'py>,
+        ra_points: PyArrayLike1<'py, f64, AllowTypeChange>,
+        dec_points: PyArrayLike1<'py, f64, AllowTypeChange>,
+    ) -> PyResult<Bound<'py, PyArray1<bool>>> {
+        let (ras, decs) = coordinate_columns(&ra_points, &dec_points)?;
+
+        let inside = py.detach(|| {
+            let Some(bounds) = self.bounds else {
+                return self.polygon.are_inside(&ras.to_vec(), &decs.to_vec());
+            };
+
+            // Only points inside the bounding cap are handed to the exact test.
+            let candidates: Vec<usize> = (0..ras.len())
+                .into_par_iter()
+                .with_min_len(MIN_POINTS_PER_TASK)
+                .filter(|&i| bounds.may_contain(ras[i], decs[i]))
+                .collect();
+            let candidate_ras: Vec<f64> = candidates.iter().map(|&i| ras[i]).collect();
+            let candidate_decs: Vec<f64> = candidates.iter().map(|&i| decs[i]).collect();
+            let candidate_inside = self.polygon.are_inside(&candidate_ras, &candidate_decs);
+
+            let mut inside = vec![false; ras.len()];
+            for (&i, &ins) in candidates.iter().zip(candidate_inside.iter()) {
+                inside[i] = ins;
+            }
+            inside
+        });
+        Ok(inside.into_pyarray(py))
+    }
+}
+
+impl Polygon {
+    fn from_columns(ra_verticies: Vec<f64>, dec_verticies: Vec<f64>) -> Self {
+        let bounds = BoundingCap::around(&ra_verticies, &dec_verticies);
+        let polygon = SphericalPolygon::new(ra_verticies, dec_verticies);
+        Polygon { polygon, bounds }
+    }
+
+    fn may_contain(&self, ra_point: f64, dec_point: f64) -> bool {
+        self.bounds
+            .is_none_or(|bounds| bounds.may_contain(ra_point, dec_point))
     }
 }
 
-#[pyclass]
+#[pyclass(frozen)]
 pub struct Aperture {
-    aperture: SphericalAperture,
+    center: SkyCenter,
+    cos_radius: f64,
 }
 
 #[pymethods]
 impl Aperture {
     #[new]
     pub fn new(ra_center: f64, dec_center: f64, radius_deg: f64) -> Self {
-        let sph_app = SphericalAperture::new(ra_center, dec_center, radius_deg);
-        Aperture { aperture: sph_app }
+        Aperture {
+            center: SkyCenter::new(ra_center, dec_center),
+            cos_radius: kernels::cos_radius(radius_deg),
+        }
     }
 
     pub fn is_inside(&self, ra_point: f64, dec_point: f64) -> bool {
-        self.aperture.is_inside(ra_point, dec_point)
+        kernels::aperture_contains(&self.center, self.cos_radius, ra_point, dec_point)
     }
 
-    pub fn check_points(&self, ra_points: Vec<f64>, dec_points: Vec<f64>) -> Vec<bool> {
-        self.aperture.are_inside(&ra_points, &dec_points)
+    pub fn check_points<'py>(
+        &self,
+        py: Python<'py>,
+        ra_points: PyArrayLike1<'py, f64, AllowTypeChange>,
+        dec_points: PyArrayLike1<'py, f64, AllowTypeChange>,
+    ) -> PyResult<Bound<'py, PyArray1<bool>>> {
+        let (ras, decs) = coordinate_columns(&ra_points, &dec_points)?;
+        let inside: Vec<bool> = py.detach(|| {
+            ras.par_iter()
+                .zip(decs.par_iter())
+                .with_min_len(MIN_POINTS_PER_TASK)
+                .map(|(&ra, &dec)| self.is_inside(ra, dec))
+                .collect()
+        });
+        Ok(inside.into_pyarray(py))
     }
 }
 
-#[pyclass]
+impl Aperture {
+    fn bounding_cap(&self) -> BoundingCap {
+        BoundingCap::new(self.center, self.cos_radius)
+    }
+}
+
+#[pyclass(frozen)]
 pub struct Anulus {
-    anulus: SphericalAnulus,
+    center: SkyCenter,
+    cos_inner: f64,
+    cos_outer: f64,
 }
 
 #[pymethods]
 impl Anulus {
     #[new]
     pub fn new(ra_center: f64, dec_center: f64, inner_radius: f64, outer_radius: f64) -> Self {
-        let sph_app = SphericalAnulus::new(ra_center, dec_center, inner_radius, outer_radius);
-        Anulus { anulus: sph_app }
+        Anulus {
+            center: SkyCenter::new(ra_center, dec_center),
+            cos_inner: kernels::cos_inner_radius(inner_radius),
+            cos_outer: kernels::cos_radius(outer_radius),
+        }
     }
 
     pub fn is_inside(&self, ra_point: f64, dec_point: f64) -> bool {
-        self.anulus.is_inside(ra_point, dec_point)
+        kernels::anulus_contains(
+            &self.center,
+            self.cos_inner,
+            self.cos_outer,
+            ra_point,
+            dec_point,
+        )
+    }
+
+    pub fn check_points<'py>(
+        &self,
+        py: Python<'py>,
+        ra_points: PyArrayLike1<'py, f64, AllowTypeChange>,
+        dec_points: PyArrayLike1<'py, f64, AllowTypeChange>,
+    ) -> PyResult<Bound<'py, PyArray1<bool>>> {
+        let (ras, decs) = coordinate_columns(&ra_points, &dec_points)?;
+        let inside: Vec<bool> = py.detach(|| {
+            ras.par_iter()
+                .zip(decs.par_iter())
+                .with_min_len(MIN_POINTS_PER_TASK)
+                .map(|(&ra, &dec)| self.is_inside(ra, dec))
+                .collect()
+        });
+        Ok(inside.into_pyarray(py))
     }
+}
 
-    pub fn check_points(&self, ra_points: Vec<f64>, dec_points: Vec<f64>) -> Vec<bool> {
-        self.anulus.are_inside(&ra_points, &dec_points)
+impl Anulus {
+    fn bounding_cap(&self) -> BoundingCap {
+        BoundingCap::new(self.center, self.cos_outer)
     }
 }
 
 #[pyfunction]
-pub fn apply_apertures(
-    py: Python,
-    ras: Vec<f64>,
-    decs: Vec<f64>,
+pub fn apply_apertures<'py>(
+    py: Python<'py>,
+    ras: PyArrayLike1<'py, f64, AllowTypeChange>,
+    decs: PyArrayLike1<'py, f64, AllowTypeChange>,
     apertures: Vec<Py<Aperture>>,
-) -> PyResult<Vec<bool>> {
-    let tree = build_kd_tree(&ras, &decs);
+) -> PyResult<Bound<'py, PyArray1<bool>>> {
+    let (ras, decs) = coordinate_columns(&ras, &decs)?;
 
     let mut result = vec![false; ras.len()];
 
-    for aperture_py in apertures.iter() {
-        let aperture = aperture_py.borrow(py);
-        let inside = aperture.aperture.are_inside_tree(&tree, &ras, &decs);
-
-        // Combine with OR logic (like combine_bool_vecs)
-        for (r, &ins) in result.iter_mut().zip(inside.iter()) {
-            *r = *r || ins;
+    if let Some(tree) = unit_vector_tree(&ras, &decs) {
+        for aperture_py in apertures.iter() {
+            let aperture = aperture_py.get();
+            mark_inside(
+                &tree,
+                &ras,
+                &decs,
+                &aperture.bounding_cap(),
+                |ra, dec| aperture.is_inside(ra, dec),
+                &mut result,
+            );
         }
     }
 
-    Ok(result)
+    Ok(result.into_pyarray(py))
 }
 
 #[pyfunction]
-pub fn apply_annuli(
-    py: Python,
-    ras: Vec<f64>,
-    decs: Vec<f64>,
+pub fn apply_annuli<'py>(
+    py: Python<'py>,
+    ras: PyArrayLike1<'py, f64, AllowTypeChange>,
+    decs: PyArrayLike1<'py, f64, AllowTypeChange>,
     annuli: Vec<Py<Anulus>>,
-) -> PyResult<Vec<bool>> {
-    let tree = build_kd_tree(&ras, &decs);
+) -> PyResult<Bound<'py, PyArray1<bool>>> {
+    let (ras, decs) = coordinate_columns(&ras, &decs)?;
 
     let mut result = vec![false; ras.len()];
 
-    for anulus_py in annuli.iter() {
-        let anulus = anulus_py.borrow(py);
-        let inside = anulus.anulus.are_inside_tree(&tree, &ras, &decs);
-
-        // Combine with OR logic (like combine_bool_vecs)
-        for (r, &ins) in result.iter_mut().zip(inside.iter()) {
-            *r = *r || ins;
+    if let Some(tree) = unit_vector_tree(&ras, &decs) {
+        for anulus_py in annuli.iter() {
+            let anulus = anulus_py.get();
+            mark_inside(
+                &tree,
+                &ras,
+                &decs,
+                &anulus.bounding_cap(),
+                |ra, dec| anulus.is_inside(ra, dec),
+                &mut result,
+            );
         }
     }
 
-    Ok(result)
+    Ok(result.into_pyarray(py))
 }
 
 #[pyfunction]
-pub fn apply_polygons(
-    py: Python,
-    ras: Vec<f64>,
-    decs: Vec<f64>,
+pub fn apply_polygons<'py>(
+    py: Python<'py>,
+    ras: PyArrayLike1<'py, f64, AllowTypeChange>,
+    decs: PyArrayLike1<'py, f64, AllowTypeChange>,
     polygons: Vec<Py<Polygon>>,
-) -> PyResult<Vec<bool>> {
+) -> PyResult<Bound<'py, PyArray1<bool>>> {
+    let (ras, decs) = coordinate_columns(&ras, &decs)?;
+    let (ras, decs) = (ras.into_owned(), decs.into_owned());
     let tree = build_kd_tree(&ras, &decs);
 
     let mut result = vec![false; ras.len()];
 
     for polygon_py in polygons.iter() {
-        let polygon = polygon_py.borrow(py);
+        let polygon = polygon_py.get();
         let inside = polygon.polygon.are_inside_tree(&tree, &ras, &decs);
 
         // Combine with OR logic (like combine_bool_vecs)
         for (r, &ins) in result.iter_mut().zip(inside.iter()) {
-            *r = *r || ins;
+            *r |= ins;
         }
     }
 
-    Ok(result)
+    Ok(result.into_pyarray(py))
+}
+
+/// One of the region classes, held by a [`RegionIndex`].
+enum Region {
+    Aperture(Py<Aperture>),
+    Anulus(Py<Anulus>),
+    Polygon(Py<Polygon>),
+}
+
+impl Region {
+    fn extract(region: &Bound<'_, PyAny>) -> PyResult<Self> {
+        if let Ok(aperture) = region.extract::<Py<Aperture>>() {
+            Ok(Region::Aperture(aperture))
+        } else if let Ok(anulus) = region.extract::<Py<Anulus>>() {
+            Ok(Region::Anulus(anulus))
+        } else if let Ok(polygon) = region.extract::<Py<Polygon>>() {
+            Ok(Region::Polygon(polygon))
+        } else {
+            Err(PyTypeError::new_err(
+                "regions must be Aperture, Anulus or Polygon instances",
+            ))
+        }
+    }
+
+    fn is_inside(&self, ra_point: f64, dec_point: f64) -> bool {
+        match self {
+            Region::Aperture(aperture) => aperture.get().is_inside(ra_point, dec_point),
+            Region::Anulus(anulus) => anulus.get().is_inside(ra_point, dec_point),
+            Region::Polygon(polygon) => polygon.get().is_inside(ra_point, dec_point),
+        }
+    }
+
+    /// A cap containing the whole region, or `None` if the region is too large to bound.
+    fn bounding_cap(&self) -> Option<BoundingCap> {
+        match self {
+            Region::Aperture(aperture) => Some(aperture.get().bounding_cap()),
+            Region::Anulus(anulus) => Some(anulus.get().bounding_cap()),
+            Region::Polygon(polygon) => polygon.get().bounds,
+        }
+    }
+}
+
+/// Spatial index over many regions for "which regions contain this point" queries.
+///
+/// Region centers are stored as unit vectors in a kd-tree. A query only runs the exact
+/// containment test on regions whose center lies within the largest region radius of the
+/// point. Regions with no bounding cap (very large polygons) are always tested.
+#[pyclass(frozen)]
+pub struct RegionIndex {
+    regions: Vec<Region>,
+    tree: Option<UnitVectorTree>,
+    tree_regions: Vec<usize>,
+    unbounded_regions: Vec<usize>,
+    search_chord_squared: f64,
+}
+
+#[pymethods]
+impl RegionIndex {
+    #[new]
+    pub fn new(regions: Vec<Bound<'_, PyAny>>) -> PyResult<Self> {
+        let regions = regions
+            .iter()
+            .map(Region::extract)
+            .collect::<PyResult<Vec<Region>>>()?;
+
+        let mut centers = Vec::new();
+        let mut tree_regions = Vec::new();
+        let mut unbounded_regions = Vec::new();
+        let mut search_chord_squared: f64 = 0.0;
+        for (i, region) in regions.iter().enumerate() {
+            match region.bounding_cap() {
+                Some(cap) => {
+                    centers.push(cap.center().unit_vector());
+                    tree_regions.push(i);
+                    search_chord_squared = search_chord_squared.max(cap.chord_squared());
+                }
+                None => unbounded_regions.push(i),
+            }
+        }
+        let tree = (!centers.is_empty()).then(|| ImmutableKdTree::new_from_slice(&centers));
+
+        Ok(RegionIndex {
+            regions,
+            tree,
+            tree_regions,
+            unbounded_regions,
+            search_chord_squared,
+        })
+    }
+
+    /// Indices (into the list given to the constructor) of every region containing the point.
+    pub fn query(&self, ra_point: f64, dec_point: f64) -> Vec<usize> {
+        let mut candidates = self.unbounded_regions.clone();
+        if let Some(tree) = &self.tree {
+            let point = SkyCenter::new(ra_point, dec_point).unit_vector();
+            let nearby =
+                tree.within_unsorted::<SquaredEuclidean>(&point, self.search_chord_squared);
+            candidates.extend(nearby.iter().map(|n| self.tree_regions[n.item as usize]));
+        }
+        candidates.sort_unstable();
+        candidates.retain(|&i| self.regions[i].is_inside(ra_point, dec_point));
+        candidates
+    }
+
+    pub fn __len__(&self) -> usize {
+        self.regions.len()
+    }
 }
 
 #[pymodule]
@@ -148,6 +447,7 @@ fn regionx(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<Polygon>()?;
     m.add_class::<Anulus>()?;
     m.add_class::<Aperture>()?;
+    m.add_class::<RegionIndex>()?;
     m.add_function(wrap_pyfunction!(apply_apertures, m)?)?;
     m.add_function(wrap_pyfunction!(apply_annuli, m)?)?;
     m.add_function(wrap_pyfunction!(apply_polygons, m)?)?;
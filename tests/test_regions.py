@@ -1,8 +1,10 @@
+import numpy as np
 import pytest
 from regionx import (
     Polygon,
     Aperture,
     Anulus,
+    RegionIndex,
     apply_apertures,
     apply_annuli,
     apply_polygons,
@@ -28,6 +30,57 @@ def test_polygon_ra_edge():
         assert r == a
 
 
+def test_polygon_from_vertices():
+    """
+    Tests that a polygon built from an (N, 2) vertex array matches the column constructor.
+    """
+    vertices = np.array([[359, 80], [359, 82], [1, 82], [1, 80]])
+    poly = Polygon.from_vertices(vertices)
+    assert poly.is_inside(0.0, 81)
+    assert not poly.is_inside(300, 80)
+    results = poly.check_points([0, 300, 359], [81, 80, 81])
+    for r, a in zip(results, [True, False, False]):
+        assert r == a
+
+    with pytest.raises(ValueError):
+        Polygon.from_vertices(np.zeros((4, 3)))
+
+
+def _grid(ra_min, ra_max, dec_min, dec_max, step=0.25):
+    ra, dec = np.meshgrid(
+        np.arange(ra_min, ra_max, step), np.arange(dec_min, dec_max, step)
+    )
+    return np.mod(ra.ravel(), 360.0), np.clip(dec.ravel(), -90.0, 90.0)
+
+
+@pytest.mark.parametrize(
+    "ra_vertices, dec_vertices, grid",
+    [
+        # Spans more than 180 degrees of RA, so no bounding cap is built.
+        ([0, 100, 200, 200, 100, 0], [10, 10, 10, 20, 20, 20], (-10, 370, 5, 25, 1.0)),
+        # Around the pole, also without a cap.
+        ([0, 90, 180, 270], [80, 80, 80, 80], (0, 360, 70, 90, 1.0)),
+        # Next to the pole, where great circle edges bulge past dec_max.
+        ([0, 60, 60, 0], [70, 70, 80, 80], (-20, 80, 60, 90)),
+        # Small polygon, with the grid reaching outside the RA/Dec box but inside the cap.
+        ([10, 14, 14, 10], [-3, -3, 3, 3], (5, 19, -8, 8, 0.1)),
+        # Vertices listed out of RA order across 0/360.
+        ([2, 358, 357, 1, 3], [10, 11, 14, 15, 12], (-10, 10, 5, 20)),
+    ],
+)
+def test_polygon_prefilter_matches_exact(ra_vertices, dec_vertices, grid):
+    """
+    The bounding cap may only skip points that the exact polygon test rejects anyway.
+    """
+    poly = Polygon(ra_vertices, dec_vertices)
+    eval_ra, eval_dec = _grid(*grid)
+    exact = apply_polygons(eval_ra, eval_dec, [poly])
+    assert exact.any()
+    np.testing.assert_array_equal(poly.check_points(eval_ra, eval_dec), exact)
+    single = [poly.is_inside(ra, dec) for ra, dec in zip(eval_ra, eval_dec)]
+    np.testing.assert_array_equal(single, exact)
+
+
 def test_aperture_ra_edge():
     """
     Tests that an aperture works across the 0/360 line.
@@ -80,6 +133,49 @@ def test_anulus_ra_edge():
         assert app.is_inside(ra, dec) == ans
 
 
+def test_check_points_numpy():
+    """
+    Tests that check_points takes numpy arrays (including strided views) and returns a bool mask.
+    """
+    app = Aperture(0, 0, 1)
+    eval_ra = np.array([0.0, 99.0, 0.1, 99.0, 358, 99.0])
+    eval_dec = np.array([0.0, 99.0, 0.1, 99.0, 0, 99.0])
+    results = app.check_points(eval_ra[::2], eval_dec[::2])
+    assert isinstance(results, np.ndarray)
+    assert results.dtype == np.bool_
+    np.testing.assert_array_equal(results, [True, True, False])
+
+    results = app.check_points(np.array([0, 358], dtype=np.int64), [0, 0])
+    np.testing.assert_array_equal(results, [True, False])
+
+    with pytest.raises(ValueError):
+        app.check_points([0.0, 1.0], [0.0])
+
+
+def test_check_points_large_batch():
+    """
+    Batches big enough to be split over threads must match the single point results.
+    """
+    rng = np.random.default_rng(42)
+    n_points = 20_000
+    eval_ra = rng.uniform(0, 360, n_points)
+    eval_dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n_points)))
+    # Concentrate some points near the regions so both answers are well represented.
+    eval_ra[:5000] = rng.uniform(0, 20, 5000)
+    eval_dec[:5000] = rng.uniform(-10, 10, 5000)
+
+    regions = [
+        Aperture(5, 0, 4),
+        Anulus(5, 0, 2, 6),
+        Polygon([0, 12, 15, 8, 1], [-5, -6, 2, 8, 4]),
+    ]
+    for region in regions:
+        expected = [region.is_inside(ra, dec) for ra, dec in zip(eval_ra, eval_dec)]
+        results = region.check_points(eval_ra, eval_dec)
+        assert results.any() and not results.all()
+        np.testing.assert_array_equal(results, expected)
+
+
 def test_aperture_at_pole():
     """
     Checking that the aperture works at the pole.
@@ -105,6 +201,71 @@ def test_aperture_at_pole():
         assert app.is_inside(ra, dec) == ans
 
 
+def test_aperture_north_pole_and_ra_180():
+    """
+    Checking the aperture at the north pole and across RA=180.
+    """
+    app = Aperture(0, 90, 10)
+    assert app.is_inside(0, 90)
+    assert app.is_inside(123, 81)
+    assert not app.is_inside(300, 79)
+
+    app = Aperture(180, 0, 1)
+    results = app.check_points([179.5, 180.5, 181.5], [0, 0, 0])
+    for r, a in zip(results, [True, True, False]):
+        assert r == a
+
+
+def test_negative_radius_contains_nothing():
+    """
+    A negative radius is never reached, so it must not fold back into a positive one.
+    """
+    app = Aperture(0, 0, -1)
+    assert not app.is_inside(0, 0)
+    assert not app.is_inside(0.5, 0)
+    assert not any(app.check_points([0, 0.5, 10], [0, 0, 0]))
+
+    # A negative inner radius leaves no hole in the middle.
+    anulus = Anulus(0, 0, -1, 2)
+    assert anulus.is_inside(0, 0)
+    assert anulus.is_inside(0, 1.5)
+    assert not anulus.is_inside(0, 3)
+
+    # A negative outer radius leaves nothing at all.
+    anulus = Anulus(0, 0, 1, -2)
+    assert not anulus.is_inside(0, 1.5)
+
+
+def test_zero_radius_contains_center():
+    """
+    A zero radius aperture and an anulus with no hole both contain their exact center.
+    """
+    for ra in [0, 123.4, 359.9]:
+        for dec in np.arange(-900, 901) / 10:
+            assert Aperture(ra, dec, 0).is_inside(ra, dec)
+            assert Anulus(ra, dec, 0, 1).is_inside(ra, dec)
+    assert not Aperture(0, 0, 0).is_inside(0, 0.001)
+
+
+def test_whole_sky_radius_includes_antipode():
+    """
+    Radii of 180 degrees or more cover the whole sky, including the exact antipode.
+    """
+    eval_ra = [180, 0, 90, 37.3, 180]
+    eval_dec = [0, 0, 45, -60, -12.5]
+    for radius in [180, 200]:
+        app = Aperture(0, 0, radius)
+        assert all(app.is_inside(ra, dec) for ra, dec in zip(eval_ra, eval_dec))
+        assert all(app.check_points(eval_ra, eval_dec))
+
+    app = Aperture(0, 12.5, 180)
+    assert app.is_inside(180, -12.5)
+
+    anulus = Anulus(0, 0, 10, 180)
+    assert anulus.is_inside(180, 0)
+    assert not anulus.is_inside(0, 5)
+
+
 def test_applying_multiple_apertures():
     ra_points = [0.0, 0.0, 100.0]
     dec_points = [0.0, 2.0, 100.0]
@@ -131,6 +292,23 @@ def test_applying_multiple_annuli():
         assert r == a
 
 
+def test_apply_matches_check_points_on_boundaries():
+    """
+    The apply functions and check_points must agree, including on points exactly on a radius.
+    """
+    eval_ra = [0, 0, 358.5, 358, 0, 0.1, 359.2, 0, 180, 1]
+    eval_dec = [1, 2, 0, 0, 0, 0.1, 0, -1, 0, 0]
+    for app in [Aperture(0, 0, 1), Aperture(0, 0, 2), Aperture(0, 0, -1), Aperture(0, 0, 180)]:
+        np.testing.assert_array_equal(
+            app.check_points(eval_ra, eval_dec), apply_apertures(eval_ra, eval_dec, [app])
+        )
+    for anulus in [Anulus(0, 0, 1, 2), Anulus(0, 0, 1.5, 2), Anulus(0, 0, -1, 1), Anulus(0, 0, 1, 180)]:
+        np.testing.assert_array_equal(
+            anulus.check_points(eval_ra, eval_dec), apply_annuli(eval_ra, eval_dec, [anulus])
+        )
+    assert apply_apertures([], [], [Aperture(0, 0, 1)]).shape == (0,)
+
+
 def test_applying_multiple_polygons():
     ra_points = [0, 181, 270]
     dec_points = [0.5, 20, 30]
@@ -141,3 +319,81 @@ def test_applying_multiple_polygons():
     results = apply_polygons(ra_points, dec_points, regions)
     for r, a in zip(results, answers):
         assert r == a
+
+
+def test_apply_regions_numpy():
+    """
+    Tests that the apply functions take numpy arrays and return a single bool mask.
+    """
+    ra_points = np.array([0.0, 0.0, 100.0, 358.5])
+    dec_points = np.array([0.0, 2.0, 100.0, 0.0])
+    results = apply_apertures(ra_points, dec_points, [Aperture(0, 0, 1)])
+    assert isinstance(results, np.ndarray)
+    assert results.dtype == np.bool_
+    np.testing.assert_array_equal(results, [True, False, False, False])
+
+    results = apply_annuli(ra_points, dec_points, [Anulus(0, 0, 1, 2)])
+    np.testing.assert_array_equal(results, [False, True, False, True])
+
+
+def test_region_index_query():
+    """
+    Tests that the region index returns every region containing a point, and only those.
+    """
+    regions = [
+        Aperture(0, 0, 1),
+        Anulus(0, 0, 1, 2),
+        Aperture(180, 45, 2),
+        Polygon([359, 359, 1, 1], [0, 1, 1, 0]),
+    ]
+    index = RegionIndex(regions)
+    assert len(index) == 4
+    assert index.query(0, 0.5) == [0, 3]
+    assert index.query(0, 1.5) == [1]
+    assert index.query(180, 45) == [2]
+    assert index.query(90, -45) == []
+
+    assert RegionIndex([]).query(0, 0) == []
+    with pytest.raises(TypeError):
+        RegionIndex([regions[0], "not a region"])
+
+
+def test_region_index_matches_brute_force():
+    """
+    With hundreds of regions the tree splits, so the pruning has to agree with testing every
+    region directly.
+    """
+    rng = np.random.default_rng(7)
+    regions = []
+    for ra, dec, radius in zip(
+        rng.uniform(0, 360, 150), rng.uniform(-80, 80, 150), rng.uniform(0.5, 5, 150)
+    ):
+        regions.append(Aperture(ra, dec, radius))
+    for ra, dec in zip(rng.uniform(0, 360, 100), rng.uniform(-70, 70, 100)):
+        width, height = rng.uniform(1, 6, 2)
+        regions.append(
+            Polygon(
+                np.mod([ra, ra + width, ra + width, ra], 360),
+                [dec, dec, dec + height, dec + height],
+            )
+        )
+    # Concentric annuli sharing one center, more than a single kd-tree leaf holds.
+    for inner in np.arange(0, 20, 0.5):
+        regions.append(Anulus(120, -30, inner, inner + 0.5))
+    # A large region pushes the search radius up for every query.
+    regions.append(Aperture(300, 20, 60))
+    # A polygon too wide for a bounding cap, which is always tested.
+    regions.append(Polygon([0, 120, 240, 240, 120, 0], [-5, -5, -5, 5, 5, 5]))
+    rng.shuffle(regions)
+
+    index = RegionIndex(regions)
+    assert len(index) == len(regions)
+    grid_ra, grid_dec = np.meshgrid(np.arange(0, 360, 4.5), np.arange(-88, 90, 4))
+    eval_ra = np.concatenate([grid_ra.ravel(), rng.uniform(110, 130, 100)])
+    eval_dec = np.concatenate([grid_dec.ravel(), rng.uniform(-40, -20, 100)])
+    n_hits = 0
+    for ra, dec in zip(eval_ra, eval_dec):
+        expected = [i for i, r in enumerate(regions) if r.is_inside(ra, dec)]
+        assert index.query(ra, dec) == expected
+        n_hits += len(expected)
+    assert n_hits > 0